@@ -7,6 +7,16 @@ import jwt
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
+import atexit
+import fcntl
+import multiprocessing
+import shutil
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from report_worker import count_groups, grouped_counts_chunk
 
 app = Flask(__name__)
 CORS(app)
@@ -14,10 +24,17 @@ CORS(app)
 # Configuration
 app.config['SECRET_KEY'] = 'your-secret-key'  # Change this in production
 app.config['JWT_EXPIRATION_SECONDS'] = 86400  # 24 hours
+app.config['SNAPSHOT_INTERVAL_SECONDS'] = 900  # 15 minutes, 0 disables the scheduler
+app.config['SNAPSHOT_BATCH_SIZE'] = 5000  # rows read from SQLite per query
+app.config['SNAPSHOT_RETENTION_SECONDS'] = 3600  # how long a replaced snapshot stays readable
+app.config['REPORT_PARALLEL_MIN_ROWS'] = 1000000  # below this, group-bys run in-process
 
 # Database setup
 DB_PATH = os.path.join(os.path.dirname(__file__), 'lead_generation.db')
 
+# Reporting snapshot location
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -91,6 +108,8 @@ def get_db_connection():
 @app.before_first_request
 def before_first_request():
     init_db()
+    if app.config['SNAPSHOT_INTERVAL_SECONDS'] > 0:
+        schedule_snapshot(0)
 
 # Helper function to generate JWT token
 def generate_token(user_id, username, is_admin):
@@ -142,6 +161,16 @@ def token_required(f):
     decorated.__name__ = f.__name__
     return decorated
 
+# Middleware to restrict a route to admin users, applied after token_required
+def admin_required(f):
+    def decorated(current_user, *args, **kwargs):
+        if not current_user['is_admin']:
+            return jsonify({'message': 'Admin access required'}), 403
+        return f(current_user, *args, **kwargs)
+
+    decorated.__name__ = f.__name__
+    return decorated
+
 # Authentication routes
 @app.route('/api/register', methods=['POST'])
 def register():
@@ -560,6 +589,383 @@ def get_dashboard_stats(current_user):
         'recentLeads': recent_leads
     }), 200
 
+# Reporting snapshot
+#
+# Admin reports are computed from a columnar snapshot instead of the live
+# database. Each snapshot is a directory under SNAPSHOT_DIR holding one .npy
+# file per column and a manifest.json with the string dictionaries. String
+# columns are dictionary-encoded into the smallest unsigned integer type that
+# fits, and columns are memory-mapped on read. SNAPSHOT_DIR/CURRENT names the
+# published snapshot and is swapped atomically once a new one is complete.
+# Generation names are UTC timestamps in SNAPSHOT_GENERATION_FORMAT.
+
+SNAPSHOT_GENERATION_FORMAT = '%Y%m%dT%H%M%S%f'
+
+# Column name -> dictionary it is encoded against
+SNAPSHOT_COLUMNS = {
+    'lead_source': 'source',
+    'lead_status': 'lead_status',
+    'lead_industry': 'industry',
+    'campaign_status': 'campaign_status',
+    'campaign_industry': 'industry',
+    'campaign_budget': None
+}
+
+_snapshot_cache = {}
+_report_executor = None
+_report_executor_lock = threading.Lock()
+
+def _code_dtype(size):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+def _encode(dictionary, value):
+    # NULL is stored as 'unknown', so a literal 'unknown' shares its code and
+    # every code has a distinct report label
+    return dictionary.setdefault(value if value is not None else 'unknown', len(dictionary))
+
+def _read_batches(conn, query, params, batch_size):
+    # Page through the table by primary key so each query is its own short
+    # read and writers are never blocked for the length of the export
+    last_id = 0
+    while True:
+        rows = conn.execute(query, (last_id,) + params + (batch_size,)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+def _published_at():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, 'CURRENT')) as f:
+            return datetime.strptime(f.read().strip(), SNAPSHOT_GENERATION_FORMAT)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _read_snapshot_columns():
+    batch_size = app.config['SNAPSHOT_BATCH_SIZE']
+    dictionaries = {'source': {}, 'lead_status': {}, 'industry': {}, 'campaign_status': {}}
+    codes = {name: array('I') for name, dictionary in SNAPSHOT_COLUMNS.items() if dictionary}
+    campaign_budget = array('d')
+
+    conn = get_db_connection()
+    try:
+        # Both passes stop at the campaigns that existed when the export
+        # started, so every snapshotted lead has its campaign in the snapshot
+        max_campaign_id = conn.execute("SELECT MAX(id) FROM campaigns").fetchone()[0] or 0
+
+        for rows in _read_batches(conn, """
+            SELECT campaigns.id, campaigns.status, campaigns.budget, users.industry FROM campaigns
+            JOIN users ON campaigns.user_id = users.id
+            WHERE campaigns.id > ? AND campaigns.id <= ?
+            ORDER BY campaigns.id LIMIT ?
+        """, (max_campaign_id,), batch_size):
+            for row in rows:
+                codes['campaign_status'].append(_encode(dictionaries['campaign_status'], row['status']))
+                codes['campaign_industry'].append(_encode(dictionaries['industry'], row['industry']))
+                campaign_budget.append(row['budget'] or 0.0)
+
+        for rows in _read_batches(conn, """
+            SELECT leads.id, leads.source, leads.status, users.industry FROM leads
+            JOIN campaigns ON leads.campaign_id = campaigns.id
+            JOIN users ON campaigns.user_id = users.id
+            WHERE leads.id > ? AND campaigns.id <= ?
+            ORDER BY leads.id LIMIT ?
+        """, (max_campaign_id,), batch_size):
+            for row in rows:
+                codes['lead_source'].append(_encode(dictionaries['source'], row['source']))
+                codes['lead_status'].append(_encode(dictionaries['lead_status'], row['status']))
+                codes['lead_industry'].append(_encode(dictionaries['industry'], row['industry']))
+    finally:
+        conn.close()
+
+    columns = {'campaign_budget': np.frombuffer(campaign_budget, dtype=np.float64)}
+    for name, values in codes.items():
+        dtype = _code_dtype(len(dictionaries[SNAPSHOT_COLUMNS[name]]))
+        columns[name] = np.frombuffer(values, dtype=np.uint32).astype(dtype)
+    return columns, dictionaries
+
+# Exports a new snapshot and returns its manifest. With max_age (seconds), the
+# export is skipped and None returned if the published snapshot is newer.
+def export_snapshot(max_age=None):
+    # Exports are serialised across processes with a file lock, since every
+    # app process runs its own export timer. The freshness check happens under
+    # the lock, so only one of them scans the database per interval.
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        if max_age is not None:
+            published_at = _published_at()
+            if published_at and datetime.utcnow() - published_at < timedelta(seconds=max_age):
+                return None
+
+        columns, dictionaries = _read_snapshot_columns()
+
+        created = datetime.utcnow()
+        generation = created.strftime(SNAPSHOT_GENERATION_FORMAT)
+        manifest = {
+            'createdAt': created.isoformat() + 'Z',
+            'leadCount': len(columns['lead_status']),
+            'campaignCount': len(columns['campaign_status']),
+            'columns': SNAPSHOT_COLUMNS,
+            # Dict insertion order is code order
+            'dictionaries': {name: list(values) for name, values in dictionaries.items()}
+        }
+
+        # Build the snapshot under a temporary name so a generation directory
+        # is only ever seen complete
+        tmp_path = os.path.join(SNAPSHOT_DIR, 'tmp-' + generation)
+        os.makedirs(tmp_path)
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), values)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        os.rename(tmp_path, os.path.join(SNAPSHOT_DIR, generation))
+
+        current_tmp = os.path.join(SNAPSHOT_DIR, 'CURRENT.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(generation)
+        os.replace(current_tmp, os.path.join(SNAPSHOT_DIR, 'CURRENT'))
+
+        _prune_snapshots(created)
+
+    return manifest
+
+def _prune_snapshots(now):
+    # Called with the snapshot file lock held, so any tmp- directory is left
+    # over from a crashed export. A replaced generation is kept for
+    # SNAPSHOT_RETENTION_SECONDS after the generation that replaced it, so
+    # reports and pool workers still reading it can finish.
+    cutoff = now - timedelta(seconds=app.config['SNAPSHOT_RETENTION_SECONDS'])
+    generations = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.startswith('tmp-'):
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+            continue
+        try:
+            generations.append((datetime.strptime(name, SNAPSHOT_GENERATION_FORMAT), name))
+        except ValueError:
+            continue
+
+    generations.sort()
+    for (_, name), (replaced_at, _) in zip(generations, generations[1:]):
+        if replaced_at < cutoff:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+
+# Returns the published snapshot, or None if there is none to read yet
+def load_snapshot():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, 'CURRENT')) as f:
+            generation = f.read().strip()
+
+        snapshot = _snapshot_cache.get('current')
+        if snapshot and snapshot['generation'] == generation:
+            return snapshot
+
+        path = os.path.join(SNAPSHOT_DIR, generation)
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        snapshot = {
+            'generation': generation,
+            'path': path,
+            'manifest': manifest,
+            'columns': {
+                name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                for name in manifest['columns']
+            }
+        }
+    except FileNotFoundError:
+        return None
+
+    _snapshot_cache['current'] = snapshot
+    return snapshot
+
+def schedule_snapshot(delay=None):
+    if delay is None:
+        delay = app.config['SNAPSHOT_INTERVAL_SECONDS']
+    timer = threading.Timer(delay, _run_scheduled_snapshot)
+    timer.daemon = True
+    timer.start()
+
+def _run_scheduled_snapshot():
+    try:
+        export_snapshot(max_age=app.config['SNAPSHOT_INTERVAL_SECONDS'])
+    except Exception:
+        app.logger.exception('Snapshot export failed')
+    schedule_snapshot()
+
+def _get_report_executor():
+    global _report_executor
+    with _report_executor_lock:
+        if _report_executor is None:
+            # Workers come from a forkserver rather than forking this process,
+            # which runs request threads and the snapshot timer
+            _report_executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+            atexit.register(_report_executor.shutdown)
+        return _report_executor
+
+def _discard_report_executor(executor):
+    # A dead worker breaks the whole pool, so drop it and let the next
+    # parallel report start a fresh one
+    global _report_executor
+    with _report_executor_lock:
+        if _report_executor is executor:
+            _report_executor = None
+    executor.shutdown(wait=False)
+
+# Count leads grouped by one or more lead columns. Returns an array with one
+# axis per column, indexed by dictionary code.
+def grouped_counts(snapshot, names):
+    manifest = snapshot['manifest']
+    sizes = [len(manifest['dictionaries'][manifest['columns'][name]]) for name in names]
+    rows = manifest['leadCount']
+    workers = os.cpu_count() or 1
+
+    if rows >= app.config['REPORT_PARALLEL_MIN_ROWS'] and workers > 1:
+        bounds = np.linspace(0, rows, workers + 1, dtype=np.int64)
+        executor = _get_report_executor()
+        try:
+            futures = [
+                executor.submit(grouped_counts_chunk, snapshot['path'], names, sizes, int(start), int(stop))
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            return sum(future.result() for future in futures).reshape(sizes)
+        except BrokenProcessPool:
+            app.logger.exception('Report worker pool broke, counting in-process')
+            _discard_report_executor(executor)
+
+    counts = count_groups([snapshot['columns'][name] for name in names], sizes)
+    return counts.reshape(sizes)
+
+def _labels(snapshot, dictionary):
+    return snapshot['manifest']['dictionaries'][dictionary]
+
+def _code_of(snapshot, dictionary, value):
+    values = snapshot['manifest']['dictionaries'][dictionary]
+    return values.index(value) if value in values else None
+
+# Admin report routes
+@app.route('/api/admin/reports/snapshot', methods=['POST'])
+@token_required
+@admin_required
+def refresh_report_snapshot(current_user):
+    manifest = export_snapshot()
+    return jsonify({
+        'message': 'Snapshot exported successfully',
+        'snapshotCreatedAt': manifest['createdAt'],
+        'leadCount': manifest['leadCount'],
+        'campaignCount': manifest['campaignCount']
+    }), 201
+
+@app.route('/api/admin/reports/leads', methods=['GET'])
+@token_required
+@admin_required
+def get_leads_report(current_user):
+    snapshot = load_snapshot()
+    if not snapshot:
+        return jsonify({'message': 'Report snapshot not available yet'}), 503
+
+    report = {
+        'snapshotCreatedAt': snapshot['manifest']['createdAt'],
+        'totalLeads': snapshot['manifest']['leadCount']
+    }
+    for key, column, dictionary in (
+        ('leadsBySource', 'lead_source', 'source'),
+        ('leadsByStatus', 'lead_status', 'lead_status'),
+        ('leadsByIndustry', 'lead_industry', 'industry')
+    ):
+        counts = grouped_counts(snapshot, [column])
+        report[key] = {
+            label: int(count)
+            for label, count in zip(_labels(snapshot, dictionary), counts)
+            if count
+        }
+
+    return jsonify(report), 200
+
+@app.route('/api/admin/reports/conversion', methods=['GET'])
+@token_required
+@admin_required
+def get_conversion_report(current_user):
+    snapshot = load_snapshot()
+    if not snapshot:
+        return jsonify({'message': 'Report snapshot not available yet'}), 503
+
+    counts = grouped_counts(snapshot, ['lead_industry', 'lead_status'])
+    converted_code = _code_of(snapshot, 'lead_status', 'converted')
+
+    industries = []
+    for label, row in zip(_labels(snapshot, 'industry'), counts):
+        total = int(row.sum())
+        if not total:
+            continue
+        converted = int(row[converted_code]) if converted_code is not None else 0
+        industries.append({
+            'industry': label,
+            'totalLeads': total,
+            'convertedLeads': converted,
+            'conversionRate': converted / total
+        })
+
+    return jsonify({
+        'snapshotCreatedAt': snapshot['manifest']['createdAt'],
+        'industries': industries
+    }), 200
+
+@app.route('/api/admin/reports/budget', methods=['GET'])
+@token_required
+@admin_required
+def get_budget_report(current_user):
+    snapshot = load_snapshot()
+    if not snapshot:
+        return jsonify({'message': 'Report snapshot not available yet'}), 503
+
+    columns = snapshot['columns']
+    labels = _labels(snapshot, 'industry')
+    size = len(labels)
+
+    # The campaigns table is small, so these group-bys stay in-process
+    campaigns = np.bincount(columns['campaign_industry'], minlength=size)
+    budget = np.bincount(columns['campaign_industry'], weights=columns['campaign_budget'], minlength=size)
+    active_code = _code_of(snapshot, 'campaign_status', 'active')
+    if active_code is not None:
+        active = columns['campaign_status'] == active_code
+        active_budget = np.bincount(columns['campaign_industry'][active], weights=columns['campaign_budget'][active], minlength=size)
+    else:
+        active_budget = np.zeros(size)
+
+    lead_counts = grouped_counts(snapshot, ['lead_industry', 'lead_status'])
+    converted_code = _code_of(snapshot, 'lead_status', 'converted')
+
+    industries = []
+    for code, label in enumerate(labels):
+        if not campaigns[code]:
+            continue
+        leads = int(lead_counts[code].sum())
+        converted = int(lead_counts[code][converted_code]) if converted_code is not None else 0
+        industries.append({
+            'industry': label,
+            'campaigns': int(campaigns[code]),
+            'totalBudget': float(budget[code]),
+            'activeBudget': float(active_budget[code]),
+            'totalLeads': leads,
+            'convertedLeads': converted,
+            'costPerLead': float(budget[code]) / leads if leads else None,
+            'costPerConversion': float(budget[code]) / converted if converted else None
+        })
+
+    return jsonify({
+        'snapshotCreatedAt': snapshot['manifest']['createdAt'],
+        'industries': industries
+    }), 200
+
 # Generate mock campaign data
 @app.route('/api/mock/generate', methods=['GET'])
 def generate_mock_data():
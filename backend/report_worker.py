@@ -0,0 +1,15 @@
+# Group-by kernels for the admin reports. They live outside app.py so report
+# pool workers can import them by module name however the app was started.
+import os
+import numpy as np
+
+def count_groups(columns, sizes):
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for column, size in zip(columns, sizes):
+        key = key * size + column
+    return np.bincount(key, minlength=int(np.prod(sizes)))
+
+def grouped_counts_chunk(path, names, sizes, start, stop):
+    # Runs in a worker process: map the columns and count one slice of rows
+    columns = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r')[start:stop] for name in names]
+    return count_groups(columns, sizes)